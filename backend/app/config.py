@@ -0,0 +1,54 @@
+import os
+
+# 系统配置，均可通过环境变量覆盖
+
+# 上传数据集的最大大小（MB）
+MAX_UPLOAD_BYTES = int(os.environ.get("DEEPDIVE_MAX_UPLOAD_MB", "4096")) * 1024 * 1024
+
+# 上传数据集的最大行数，0表示不限制
+MAX_UPLOAD_ROWS = int(os.environ.get("DEEPDIVE_MAX_UPLOAD_ROWS", "0"))
+
+# 上传时每次从请求中读取的字节数
+UPLOAD_CHUNK_BYTES = int(os.environ.get("DEEPDIVE_UPLOAD_CHUNK_KB", "1024")) * 1024
+
+# 解析数据集时每个分块的行数
+INGEST_CHUNK_ROWS = int(os.environ.get("DEEPDIVE_INGEST_CHUNK_ROWS", "100000"))
+
+# 上传和训练结束后保留进度信息的时间（秒），超时后清理
+PROGRESS_TTL = float(os.environ.get("DEEPDIVE_PROGRESS_TTL", "300"))
+
+# 是否允许按请求开启性能分析（管理员开关）
+PROFILING_ENABLED = os.environ.get("DEEPDIVE_PROFILING_ENABLED", "0").lower() in ("1", "true", "yes")
+
+# 开启性能分析和下载分析结果所需的令牌，为空表示不校验
+PROFILING_TOKEN = os.environ.get("DEEPDIVE_PROFILING_TOKEN", "")
+
+# 性能分析的采样间隔（毫秒）
+PROFILING_INTERVAL_MS = float(os.environ.get("DEEPDIVE_PROFILING_INTERVAL_MS", "5"))
+
+# 内存中缓存的已加载模型数量上限
+MODEL_CACHE_SIZE = int(os.environ.get("DEEPDIVE_MODEL_CACHE_SIZE", "16"))
+
+# 多模型预测时并发执行的线程数
+PREDICTION_WORKERS = int(os.environ.get("DEEPDIVE_PREDICTION_WORKERS", "8"))
+
+# 每个模型缓存的预测结果条数上限，0表示关闭预测结果缓存
+PREDICTION_CACHE_SIZE = int(os.environ.get("DEEPDIVE_PREDICTION_CACHE_SIZE", "10000"))
+
+# 预测结果缓存的有效期（秒）
+PREDICTION_CACHE_TTL = float(os.environ.get("DEEPDIVE_PREDICTION_CACHE_TTL", "300"))
+
+# 紧凑模式：上传时将数值列降精度存储（float32、最小整数类型），训练时向支持的模型传入float32矩阵
+COMPACT_MODE = os.environ.get("DEEPDIVE_COMPACT_MODE", "0").lower() in ("1", "true", "yes")
+
+# 不同取值数量不超过该值的字符串列按类别编码存储
+CATEGORICAL_MAX_UNIQUE = int(os.environ.get("DEEPDIVE_CATEGORICAL_MAX_UNIQUE", "256"))
+
+# 自动选择类别编码时，不同取值数量不超过该值的列使用独热编码，否则使用哈希编码
+CATEGORICAL_ONEHOT_MAX = int(os.environ.get("DEEPDIVE_CATEGORICAL_ONEHOT_MAX", "1000"))
+
+# 哈希编码的特征维度
+CATEGORICAL_HASH_FEATURES = int(os.environ.get("DEEPDIVE_CATEGORICAL_HASH_FEATURES", "16384"))
+
+# 单次训练的默认时间预算（秒），0表示不限制
+TRAINING_TIME_BUDGET = float(os.environ.get("DEEPDIVE_TRAINING_TIME_BUDGET", "0"))
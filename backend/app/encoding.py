@@ -0,0 +1,160 @@
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from sklearn.feature_extraction import FeatureHasher
+from sklearn.preprocessing import OneHotEncoder
+
+from .config import CATEGORICAL_HASH_FEATURES, CATEGORICAL_ONEHOT_MAX
+
+# 支持的类别编码方式，numeric表示沿用旧的强制数值转换
+categorical_encodings = ["auto", "onehot", "hash", "numeric"]
+
+# 缺失值在类别列中的占位符
+MISSING_CATEGORY = "__missing__"
+
+# 自动识别类别列时，非空值中无法转换为数字的比例超过该值才视为类别列
+NON_NUMERIC_FRACTION = 0.5
+
+def is_categorical_column(series: pd.Series) -> bool:
+    """自动模式下判断列是否按类别编码
+
+    数值列中夹杂少量无法解析的值（如"?"）时仍按数值列处理，沿用转换后均值填充的方式。
+    """
+    if pd.api.types.is_numeric_dtype(series.dtype):
+        return False
+    values = series.dropna()
+    if values.empty:
+        return False
+    converted = pd.to_numeric(values.astype(object), errors="coerce")
+    return converted.isna().mean() > NON_NUMERIC_FRACTION
+
+def _canonical_category(value: Any) -> str:
+    """类别值的规范字符串
+
+    训练数据可能来自列式存储（int8、float32等）或原文件（int64、float64），预测请求中的
+    数字则是float或字符串，这里统一表示：整数值写成整数（30、30.0和"30"都是"30"），
+    其他有限浮点数按float32的最短表示写出，其余字符串原样保留。
+    """
+    if isinstance(value, (bool, np.bool_)):
+        return str(int(value))
+    if isinstance(value, str):
+        try:
+            number = float(value)
+        except ValueError:
+            return value
+        if not np.isfinite(number):
+            return value
+        value = number
+    if isinstance(value, (int, np.integer)):
+        return str(int(value))
+    if isinstance(value, (float, np.floating)):
+        if float(value).is_integer():
+            return str(int(value))
+        return np.format_float_positional(np.float32(value), trim="-")
+    return str(value)
+
+def _as_strings(series: pd.Series) -> np.ndarray:
+    """将类别列统一转换为规范字符串，缺失值替换为占位符"""
+    if pd.api.types.is_integer_dtype(series.dtype) or pd.api.types.is_bool_dtype(series.dtype):
+        # 无缺失值的整数列可以直接批量转换
+        return series.astype(np.int64).astype(str).to_numpy()
+    values = series.astype(object)
+    missing = values.isna().to_numpy()
+    result = np.array([_canonical_category(value) for value in values.to_numpy()], dtype=object)
+    result[missing] = MISSING_CATEGORY
+    return result.astype(str)
+
+class FeatureEncoder:
+    """将特征表编码为scipy稀疏矩阵
+
+    数值列转换为浮点数并用训练集均值填充缺失值；类别列使用独热编码或哈希编码，
+    训练时未出现的类别编码为全零。编码器随模型一起保存，预测时使用同样的编码。
+    """
+    def __init__(
+        self,
+        feature_columns: List[str],
+        categorical_columns: List[str],
+        method: str = "auto",
+        n_hash_features: int = CATEGORICAL_HASH_FEATURES
+    ):
+        if method not in ("auto", "onehot", "hash"):
+            raise ValueError(f"不支持的类别编码方式: {method}")
+        self.feature_columns = list(feature_columns)
+        self.categorical_columns = [col for col in feature_columns if col in categorical_columns]
+        self.numeric_columns = [col for col in feature_columns if col not in categorical_columns]
+        self.method = method
+        self.n_hash_features = n_hash_features
+        self.onehot_columns: List[str] = []
+        self.hash_columns: List[str] = []
+        self.means: Optional[np.ndarray] = None
+        self._onehot: Optional[OneHotEncoder] = None
+        self._hasher: Optional[FeatureHasher] = None
+
+    def fit(self, df: pd.DataFrame) -> "FeatureEncoder":
+        numeric = df[self.numeric_columns].apply(pd.to_numeric, errors="coerce")
+        # 整列缺失时用0填充
+        self.means = np.nan_to_num(numeric.mean().to_numpy(dtype=np.float64), nan=0.0)
+
+        for col in self.categorical_columns:
+            if self.method == "onehot":
+                self.onehot_columns.append(col)
+            elif self.method == "hash":
+                self.hash_columns.append(col)
+            elif df[col].nunique(dropna=False) <= CATEGORICAL_ONEHOT_MAX:
+                self.onehot_columns.append(col)
+            else:
+                self.hash_columns.append(col)
+
+        if self.onehot_columns:
+            self._onehot = OneHotEncoder(handle_unknown="ignore", sparse_output=True)
+            self._onehot.fit(np.column_stack([_as_strings(df[col]) for col in self.onehot_columns]))
+        if self.hash_columns:
+            self._hasher = FeatureHasher(n_features=self.n_hash_features, input_type="string", alternate_sign=False)
+        return self
+
+    def transform(self, df: pd.DataFrame, dtype: Any = np.float64) -> sparse.csr_matrix:
+        blocks = []
+        if self.numeric_columns:
+            numeric = df[self.numeric_columns].apply(pd.to_numeric, errors="coerce").to_numpy(dtype=np.float64, copy=True)
+            inds = np.where(np.isnan(numeric))
+            numeric[inds] = np.take(self.means, inds[1])
+            blocks.append(sparse.csr_matrix(numeric))
+        if self._onehot is not None:
+            blocks.append(self._onehot.transform(
+                np.column_stack([_as_strings(df[col]) for col in self.onehot_columns])
+            ))
+        if self._hasher is not None:
+            columns = [_as_strings(df[col]) for col in self.hash_columns]
+            tokens = ([f"{col}={value}" for col, value in zip(self.hash_columns, row)] for row in zip(*columns))
+            blocks.append(self._hasher.transform(tokens))
+        return sparse.hstack(blocks, format="csr", dtype=dtype)
+
+    def fit_transform(self, df: pd.DataFrame, dtype: Any = np.float64) -> sparse.csr_matrix:
+        return self.fit(df).transform(df, dtype=dtype)
+
+    @property
+    def feature_names(self) -> List[str]:
+        """编码后各列的名称"""
+        names = list(self.numeric_columns)
+        if self._onehot is not None:
+            for col, categories in zip(self.onehot_columns, self._onehot.categories_):
+                names.extend(f"{col}={category}" for category in categories)
+        if self._hasher is not None:
+            names.extend(f"哈希特征{i+1}" for i in range(self.n_hash_features))
+        return names
+
+    def summarize_importance(self, importance: Dict[str, float]) -> Dict[str, float]:
+        """将各哈希桶的系数或重要性合并为一项（绝对值之和），其余特征保持不变
+
+        多个哈希列共用同一组桶，无法按原始列拆分。
+        """
+        if self._hasher is None:
+            return importance
+        hashed = set(f"哈希特征{i+1}" for i in range(self.n_hash_features))
+        summary = {name: value for name, value in importance.items() if name not in hashed}
+        summary[f"哈希特征({', '.join(self.hash_columns)})"] = float(
+            sum(abs(value) for name, value in importance.items() if name in hashed)
+        )
+        return summary
@@ -1,28 +1,61 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException, Form, Depends
+from fastapi import FastAPI, UploadFile, File, HTTPException, Form, Depends, Request, Query
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
+from fastapi.responses import JSONResponse, Response, FileResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from typing import List, Dict, Any, Optional
 import pandas as pd
 import numpy as np
+import asyncio
 import os
+import time
 import json
 import joblib
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 import uuid
-import shutil
 from pydantic import BaseModel
 
 # 导入模型相关模块
-from .simple_models import model_registry, train_model, evaluate_model, predict_with_model
+from .simple_models import model_registry, train_model, evaluate_model, float32_model_types
 from .schemas import (
     DatasetInfo,
     ModelInfo,
     TrainingRequest,
     PredictionRequest,
-    EvaluationResult
+    EvaluationResult,
+    EnsembleRequest,
+    EnsembleInfo,
+    MultiPredictionRequest
 )
+from .config import (
+    MAX_UPLOAD_BYTES,
+    MAX_UPLOAD_ROWS,
+    UPLOAD_CHUNK_BYTES,
+    PROGRESS_TTL,
+    PROFILING_ENABLED,
+    PROFILING_TOKEN,
+    PROFILING_INTERVAL_MS,
+    PREDICTION_WORKERS,
+    COMPACT_MODE,
+    TRAINING_TIME_BUDGET
+)
+from .dataset_store import (
+    StreamingDatasetWriter,
+    ingest_dataset,
+    ingestion_progress,
+    load_columns,
+    read_rows,
+    remove_dataset_files,
+    row_index_path,
+    sample_rows
+)
+from .encoding import FeatureEncoder, categorical_encodings, is_categorical_column
+from .model_store import as_numeric_features, load_encoder, load_model_info, predict_cached, prediction_cache
+from .profiling import PROFILES_DIR, SamplingProfiler, active_profiler, profile_path, track_thread
+from .serialization import FastJSONResponse, FLOAT32_HEADERS, FLOAT32_MEDIA_TYPE, dumps, float32_response, wants_float32
 
-app = FastAPI(title="多维数据拟合与预测系统")
+app = FastAPI(title="多维数据拟合与预测系统", default_response_class=FastJSONResponse)
 
 # 配置CORS
 app.add_middleware(
@@ -31,12 +64,127 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=FLOAT32_HEADERS + ["X-Profile-Id"],
+)
+
+# multipart请求中除文件内容外其他表单字段和分隔符的大小余量
+UPLOAD_FORM_OVERHEAD_BYTES = 1024 * 1024
+
+class UploadSizeLimitMiddleware:
+    """在请求体被解析和缓存到临时文件之前限制上传大小
+
+    Content-Length超过上限时直接返回413；没有Content-Length（分块传输）时边接收边计数，
+    超过上限即中止读取。
+    """
+    def __init__(self, app, max_bytes: int, paths: List[str]):
+        self.app = app
+        self.max_bytes = max_bytes
+        self.paths = set(paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        content_length = dict(scope["headers"]).get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > self.max_bytes:
+            response = FastJSONResponse(status_code=413, content={"detail": self._detail()})
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    raise HTTPException(status_code=413, detail=self._detail())
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+    def _detail(self) -> str:
+        return f"上传的文件超过大小上限 {MAX_UPLOAD_BYTES // (1024 * 1024)}MB"
+
+app.add_middleware(
+    UploadSizeLimitMiddleware,
+    max_bytes=MAX_UPLOAD_BYTES + UPLOAD_FORM_OVERHEAD_BYTES,
+    paths=["/datasets/upload"]
 )
 
 # 确保数据目录存在
 os.makedirs("data/datasets", exist_ok=True)
 os.makedirs("data/models", exist_ok=True)
 os.makedirs("data/results", exist_ok=True)
+os.makedirs("data/ensembles", exist_ok=True)
+os.makedirs(PROFILES_DIR, exist_ok=True)
+
+# 多模型预测使用的线程池
+prediction_executor = ThreadPoolExecutor(max_workers=PREDICTION_WORKERS)
+
+# 训练进度，键为training_id
+training_progress: Dict[str, Dict[str, Any]] = {}
+
+# 推送训练进度时的轮询间隔，以及等待训练任务开始的最长时间（秒）
+TRAINING_POLL_SECONDS = 0.2
+TRAINING_WAIT_SECONDS = 30.0
+
+def _profiling_requested(request: Request) -> bool:
+    """请求是否开启性能分析：通过请求头X-Profile或查询参数profile开启"""
+    flag = request.headers.get("X-Profile") or request.query_params.get("profile") or ""
+    if flag.lower() not in ("1", "true", "yes"):
+        return False
+    return not PROFILING_TOKEN or request.headers.get("X-Profile-Token") == PROFILING_TOKEN
+
+async def profile_requests(request: Request, call_next):
+    """对开启了性能分析的请求进行采样，结果保存到data/profiles，ID通过X-Profile-Id响应头返回"""
+    if not _profiling_requested(request):
+        return await call_next(request)
+
+    # 只采样本请求使用的线程：事件循环线程在这里登记，线程池线程由track_thread登记
+    profiler = SamplingProfiler(interval=PROFILING_INTERVAL_MS / 1000)
+    profiler.add_thread(shared=True)
+    token = active_profiler.set(profiler)
+    profiler.start()
+    try:
+        response = await call_next(request)
+    finally:
+        profiler.stop()
+        active_profiler.reset(token)
+
+    profile_id = str(uuid.uuid4())
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    profile = profiler.to_speedscope(f"{request.method} {request.url.path} {timestamp}")
+    with open(profile_path(profile_id), "wb") as f:
+        f.write(dumps(profile))
+    print(f"性能分析结果保存到: {profile_path(profile_id)}")
+
+    response.headers["X-Profile-Id"] = profile_id
+    return response
+
+class ProfiledRoute(APIRoute):
+    """同步接口在线程池中执行，包装后执行线程计入当前请求的性能分析"""
+    def __init__(self, path: str, endpoint, **kwargs):
+        if not asyncio.iscoroutinefunction(endpoint):
+            endpoint = track_thread(endpoint)
+        super().__init__(path, endpoint, **kwargs)
+
+# 只有管理员开启性能分析时才注册中间件和路由包装，关闭时请求不经过额外的中间件层
+if PROFILING_ENABLED:
+    app.middleware("http")(profile_requests)
+    app.router.route_class = ProfiledRoute
+
+def _prune_progress(registry: Dict[str, Dict[str, Any]]) -> None:
+    """清理结束时间超过PROGRESS_TTL的进度记录"""
+    now = time.time()
+    expired = [
+        key for key, progress in registry.items()
+        if "finished_at" in progress and now - progress["finished_at"] > PROGRESS_TTL
+    ]
+    for key in expired:
+        registry.pop(key, None)
 
 @app.get("/")
 def read_root():
@@ -45,31 +193,71 @@ def read_root():
 @app.post("/datasets/upload", response_model=DatasetInfo)
 async def upload_dataset(
     file: UploadFile = File(...),
-    description: str = Form(None)
+    description: str = Form(None),
+    upload_id: str = Form(None),
+    compact: Optional[bool] = Form(None)
 ):
-    """上传数据集"""
+    """上传数据集
+
+    上传内容按块写入磁盘，解析、统计和列式存储在线程池中一次完成，不阻塞事件循环。
+    客户端可提供upload_id，通过 /datasets/uploads/{upload_id}/progress 查询进度。
+    compact未指定时使用系统配置的紧凑模式。
+    """
+    # 生成唯一ID
+    dataset_id = str(uuid.uuid4())
+    upload_id = upload_id or dataset_id
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+
+    # 保存原始文件
+    filename = f"{timestamp}_{file.filename}"
+    file_path = f"data/datasets/{filename}"
+
+    if not file.filename.endswith(('.csv', '.xls', '.xlsx')):
+        raise HTTPException(status_code=400, detail="不支持的文件格式，请上传CSV或Excel文件")
+
+    _prune_progress(ingestion_progress)
+    progress = {"stage": "uploading", "bytes_received": 0, "rows_processed": 0, "dataset_id": dataset_id}
+    ingestion_progress[upload_id] = progress
+
     try:
-        # 生成唯一ID
-        dataset_id = str(uuid.uuid4())
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        # 按块保存原始文件，CSV同时构建行偏移索引
+        index_path = row_index_path(dataset_id) if file.filename.endswith('.csv') else None
+        writer = StreamingDatasetWriter(file_path, index_path)
+        try:
+            while True:
+                chunk = await file.read(UPLOAD_CHUNK_BYTES)
+                if not chunk:
+                    break
+                if writer.bytes_written + len(chunk) > MAX_UPLOAD_BYTES:
+                    raise HTTPException(
+                        status_code=413,
+                        detail=f"上传的文件超过大小上限 {MAX_UPLOAD_BYTES // (1024 * 1024)}MB"
+                    )
+                await run_in_threadpool(writer.write, chunk)
+                progress["bytes_received"] = writer.bytes_written
+        finally:
+            await run_in_threadpool(writer.close)
 
-        # 保存原始文件
-        filename = f"{timestamp}_{file.filename}"
-        file_path = f"data/datasets/{filename}"
+        # 一次遍历完成类型推断、行数统计、列统计和列式存储写入
+        progress["stage"] = "parsing"
 
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        def report(rows: int) -> None:
+            progress["rows_processed"] = rows
 
-        # 读取数据并验证
-        if file.filename.endswith('.csv'):
-            df = pd.read_csv(file_path)
-        elif file.filename.endswith(('.xls', '.xlsx')):
-            df = pd.read_excel(file_path)
-        else:
-            raise HTTPException(status_code=400, detail="不支持的文件格式，请上传CSV或Excel文件")
+        try:
+            ingested = await run_in_threadpool(
+                track_thread(ingest_dataset),
+                dataset_id,
+                file_path,
+                MAX_UPLOAD_ROWS,
+                report,
+                COMPACT_MODE if compact is None else compact
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"解析数据集失败: {str(e)}")
 
         # 基本数据验证
-        if df.empty:
+        if ingested["rows"] == 0:
             raise HTTPException(status_code=400, detail="上传的数据集为空")
 
         # 保存数据集信息
@@ -79,18 +267,40 @@ async def upload_dataset(
             "original_filename": file.filename,
             "description": description,
             "upload_time": timestamp,
-            "rows": len(df),
-            "columns": list(df.columns),
-            "file_path": file_path
+            "rows": ingested["rows"],
+            "columns": ingested["columns"],
+            "file_path": file_path,
+            "file_size": writer.bytes_written,
+            "dtypes": ingested["dtypes"],
+            "profile": ingested["profile"],
+            "storage": ingested["storage"]
         }
 
         with open(f"data/datasets/{dataset_id}.json", "w") as f:
             json.dump(dataset_info, f)
 
+        progress["stage"] = "done"
         return dataset_info
 
+    except HTTPException as e:
+        progress.update({"stage": "failed", "error": e.detail})
+        remove_dataset_files(dataset_id, file_path)
+        raise
     except Exception as e:
+        progress.update({"stage": "failed", "error": str(e)})
+        remove_dataset_files(dataset_id, file_path)
         raise HTTPException(status_code=500, detail=f"上传数据集失败: {str(e)}")
+    finally:
+        # 结束后保留一段时间供客户端查询，之后由_prune_progress清理
+        progress["finished_at"] = time.time()
+
+@app.get("/datasets/uploads/{upload_id}/progress", response_model=Dict[str, Any])
+def get_upload_progress(upload_id: str):
+    """查询数据集上传和解析进度"""
+    _prune_progress(ingestion_progress)
+    if upload_id not in ingestion_progress:
+        raise HTTPException(status_code=404, detail=f"上传任务 {upload_id} 不存在")
+    return ingestion_progress[upload_id]
 
 @app.get("/datasets", response_model=List[DatasetInfo])
 def list_datasets():
@@ -114,35 +324,122 @@ def get_dataset_details(dataset_id: str):
         with open(f"data/datasets/{dataset_id}.json", "r") as f:
             dataset_info = json.load(f)
 
-        # 读取数据集预览
-        file_path = dataset_info["file_path"]
-        if file_path.endswith('.csv'):
-            df = pd.read_csv(file_path)
-        elif file_path.endswith(('.xls', '.xlsx')):
-            df = pd.read_excel(file_path)
-
-        # 计算基本统计信息
-        stats = {}
-        for col in df.columns:
-            if pd.api.types.is_numeric_dtype(df[col]):
-                stats[col] = {
-                    "min": float(df[col].min()),
-                    "max": float(df[col].max()),
-                    "mean": float(df[col].mean()),
-                    "std": float(df[col].std())
-                }
+        # 上传时已计算列统计，只需读取前10行预览
+        if "profile" in dataset_info:
+            preview = read_rows(dataset_info, 0, 10)["rows"]
+            stats = {
+                col: {key: profile[key] for key in ("min", "max", "mean", "std")}
+                for col, profile in dataset_info["profile"].items()
+                if "mean" in profile
+            }
+        else:
+            # 旧数据集没有列统计，读取整个文件计算
+            file_path = dataset_info["file_path"]
+            if file_path.endswith('.csv'):
+                df = pd.read_csv(file_path)
+            elif file_path.endswith(('.xls', '.xlsx')):
+                df = pd.read_excel(file_path)
+
+            # 计算基本统计信息
+            stats = {}
+            for col in df.columns:
+                if pd.api.types.is_numeric_dtype(df[col]):
+                    stats[col] = {
+                        "min": float(df[col].min()),
+                        "max": float(df[col].max()),
+                        "mean": float(df[col].mean()),
+                        "std": float(df[col].std())
+                    }
+            preview = df.head(10).to_dict(orient="records")
 
-        return {
+        # 直接返回响应，跳过逐字段校验；预览中的NaN会被编码为null
+        return FastJSONResponse({
             "info": dataset_info,
-            "preview": df.head(10).to_dict(orient="records"),
+            "preview": preview,
             "stats": stats
-        }
+        })
 
     except FileNotFoundError:
         raise HTTPException(status_code=404, detail=f"数据集 {dataset_id} 不存在")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"获取数据集详情失败: {str(e)}")
 
+def _load_dataset_info(dataset_id: str) -> Dict[str, Any]:
+    """读取数据集信息，不存在时返回404"""
+    try:
+        with open(f"data/datasets/{dataset_id}.json", "r") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=f"数据集 {dataset_id} 不存在")
+
+def _check_columns(dataset_info: Dict[str, Any], columns: Optional[List[str]]) -> None:
+    """检查请求的列是否存在于数据集中"""
+    if columns:
+        missing = [col for col in columns if col not in dataset_info["columns"]]
+        if missing:
+            raise HTTPException(status_code=400, detail=f"数据集中缺少以下列: {missing}")
+
+@app.get("/datasets/{dataset_id}/preview", response_model=Dict[str, Any])
+def get_dataset_preview(
+    dataset_id: str,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=1000),
+    columns: Optional[List[str]] = Query(None)
+):
+    """分页预览数据集，只读取所需的行和列"""
+    dataset_info = _load_dataset_info(dataset_id)
+    _check_columns(dataset_info, columns)
+    try:
+        return FastJSONResponse(read_rows(dataset_info, offset, limit, columns))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"获取数据集预览失败: {str(e)}")
+
+@app.get("/datasets/{dataset_id}/sample", response_model=Dict[str, Any])
+def get_dataset_sample(
+    dataset_id: str,
+    n: int = Query(10, ge=1, le=1000),
+    seed: Optional[int] = None,
+    columns: Optional[List[str]] = Query(None)
+):
+    """随机抽样数据集中的n行（蓄水池抽样）"""
+    dataset_info = _load_dataset_info(dataset_id)
+    _check_columns(dataset_info, columns)
+    try:
+        return FastJSONResponse(sample_rows(dataset_info, n, columns, seed))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"数据集抽样失败: {str(e)}")
+
+def _check_profiling_access(request: Request) -> None:
+    """检查是否允许访问性能分析结果"""
+    if not PROFILING_ENABLED:
+        raise HTTPException(status_code=404, detail="性能分析功能未开启")
+    if PROFILING_TOKEN and request.headers.get("X-Profile-Token") != PROFILING_TOKEN:
+        raise HTTPException(status_code=403, detail="性能分析令牌无效")
+
+@app.get("/profiles", response_model=List[Dict[str, Any]])
+def list_profiles(request: Request):
+    """获取所有性能分析结果列表"""
+    _check_profiling_access(request)
+    profiles = []
+    for filename in sorted(os.listdir(PROFILES_DIR)):
+        if filename.endswith(".speedscope.json"):
+            path = os.path.join(PROFILES_DIR, filename)
+            profiles.append({
+                "id": filename[:-len(".speedscope.json")],
+                "size": os.path.getsize(path),
+                "created_time": datetime.fromtimestamp(os.path.getmtime(path)).strftime("%Y%m%d_%H%M%S")
+            })
+    return profiles
+
+@app.get("/profiles/{profile_id}")
+def download_profile(profile_id: str, request: Request):
+    """下载性能分析结果（speedscope格式，可在 https://www.speedscope.app 打开）"""
+    _check_profiling_access(request)
+    path = profile_path(os.path.basename(profile_id))
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail=f"性能分析结果 {profile_id} 不存在")
+    return FileResponse(path, media_type="application/json", filename=os.path.basename(path))
+
 @app.get("/models/available", response_model=List[Dict[str, Any]])
 def list_available_models():
     """获取所有可用的模型类型"""
@@ -156,9 +453,39 @@ def list_available_models():
         })
     return result
 
+def _coerce_numeric(df: pd.DataFrame, columns: List[str]) -> None:
+    """将非数值列转换为数值类型，无法转换的值用列均值填充"""
+    for col in columns:
+        if not pd.api.types.is_numeric_dtype(df[col]):
+            print(f"列 {col} 不是数值类型，尝试转换...")
+            try:
+                df[col] = pd.to_numeric(df[col].astype(object), errors='coerce')
+                # 检查转换后是否有NaN值
+                nan_count = df[col].isna().sum()
+                if nan_count > 0:
+                    print(f"警告: 列 {col} 转换为数值类型后有 {nan_count} 个NaN值")
+                    # 用均值填充NaN
+                    df[col] = df[col].fillna(df[col].mean())
+            except Exception as e:
+                error_msg = f"无法将列 {col} 转换为数值类型: {str(e)}"
+                print(error_msg)
+                raise HTTPException(status_code=400, detail=error_msg)
+
 @app.post("/models/train", response_model=ModelInfo)
 def train_new_model(request: TrainingRequest):
-    """训练新模型"""
+    """训练新模型
+
+    客户端可提供training_id，通过 /models/train/{training_id}/events 以SSE接收逐轮训练进度。
+    time_budget（秒）限制拟合时间，early_stopping在验证集不再提升时提前停止。
+    """
+    training_id = request.training_id or str(uuid.uuid4())
+    _prune_progress(training_progress)
+    progress = {"status": "running", "events": [], "model_id": None}
+    training_progress[training_id] = progress
+
+    def report(event: Dict[str, Any]) -> None:
+        progress["events"].append(event)
+
     try:
         print(f"收到训练请求: {request}")
 
@@ -176,59 +503,85 @@ def train_new_model(request: TrainingRequest):
             print(error_msg)
             raise HTTPException(status_code=500, detail=error_msg)
 
-        # 读取数据集
+        # 检查特征列和目标列是否存在
+        missing_features = [col for col in request.feature_columns if col not in dataset_info["columns"]]
+        if missing_features:
+            error_msg = f"数据集中缺少以下特征列: {missing_features}"
+            print(error_msg)
+            raise HTTPException(status_code=400, detail=error_msg)
+
+        if request.target_column not in dataset_info["columns"]:
+            error_msg = f"数据集中缺少目标列: {request.target_column}"
+            print(error_msg)
+            raise HTTPException(status_code=400, detail=error_msg)
+
+        # 读取数据集（只读取训练所需的列）
         try:
             file_path = dataset_info["file_path"]
             print(f"尝试读取数据集文件: {file_path}")
 
-            if file_path.endswith('.csv'):
-                df = pd.read_csv(file_path)
-            elif file_path.endswith(('.xls', '.xlsx')):
-                df = pd.read_excel(file_path)
-            else:
+            if not file_path.endswith(('.csv', '.xls', '.xlsx')):
                 error_msg = f"不支持的文件格式: {file_path}"
                 print(error_msg)
                 raise HTTPException(status_code=400, detail=error_msg)
 
+            used_columns = list(dict.fromkeys(request.feature_columns + [request.target_column]))
+            df = load_columns(dataset_info, used_columns)
+
             print(f"成功读取数据集，形状: {df.shape}")
+        except HTTPException:
+            raise
         except Exception as e:
             error_msg = f"读取数据集文件失败: {str(e)}"
             print(error_msg)
             raise HTTPException(status_code=500, detail=error_msg)
 
-        # 检查特征列和目标列是否存在
-        missing_features = [col for col in request.feature_columns if col not in df.columns]
-        if missing_features:
-            error_msg = f"数据集中缺少以下特征列: {missing_features}"
-            print(error_msg)
-            raise HTTPException(status_code=400, detail=error_msg)
+        # 确定需要类别编码的特征列
+        encoding = request.categorical_encoding or "auto"
+        if encoding not in categorical_encodings:
+            raise HTTPException(status_code=400, detail=f"不支持的类别编码方式: {encoding}")
+        if encoding == "numeric":
+            categorical_columns = []
+        elif request.categorical_columns is not None:
+            categorical_columns = request.categorical_columns
+            unknown = [col for col in categorical_columns if col not in request.feature_columns]
+            if unknown:
+                raise HTTPException(status_code=400, detail=f"类别列必须是特征列: {unknown}")
+        else:
+            categorical_columns = [col for col in request.feature_columns if is_categorical_column(df[col])]
 
-        if request.target_column not in df.columns:
-            error_msg = f"数据集中缺少目标列: {request.target_column}"
-            print(error_msg)
-            raise HTTPException(status_code=400, detail=error_msg)
+        # 多项式回归会把编码后的高维特征两两组合，特征数和内存随维度平方增长
+        if categorical_columns and request.model_type == "polynomial_regression":
+            raise HTTPException(
+                status_code=400,
+                detail=f"多项式回归不支持类别特征 {categorical_columns}，请使用numeric编码或其他模型"
+            )
 
         # 准备训练数据
         try:
-            # 确保所有特征列和目标列都是数值类型
-            for col in request.feature_columns + [request.target_column]:
-                if not pd.api.types.is_numeric_dtype(df[col]):
-                    print(f"列 {col} 不是数值类型，尝试转换...")
-                    try:
-                        df[col] = pd.to_numeric(df[col], errors='coerce')
-                        # 检查转换后是否有NaN值
-                        nan_count = df[col].isna().sum()
-                        if nan_count > 0:
-                            print(f"警告: 列 {col} 转换为数值类型后有 {nan_count} 个NaN值")
-                            # 用均值填充NaN
-                            df[col] = df[col].fillna(df[col].mean())
-                    except Exception as e:
-                        error_msg = f"无法将列 {col} 转换为数值类型: {str(e)}"
-                        print(error_msg)
-                        raise HTTPException(status_code=400, detail=error_msg)
-
-            X = df[request.feature_columns].values
-            y = df[request.target_column].values
+            # 确保所有数值特征列和目标列都是数值类型（类别列由编码器处理）
+            numeric_columns = [
+                col for col in request.feature_columns + [request.target_column]
+                if col not in categorical_columns or col == request.target_column
+            ]
+            _coerce_numeric(df, numeric_columns)
+
+            # 紧凑模式下向支持的模型传入float32矩阵
+            compact = COMPACT_MODE if request.compact is None else request.compact
+            x_dtype = np.float32 if compact and request.model_type in float32_model_types else np.float64
+
+            # 有类别列时编码为稀疏矩阵，避免构建稠密的独热矩阵
+            encoder = None
+            feature_names = request.feature_columns
+            if categorical_columns:
+                print(f"类别列 {categorical_columns} 使用 {encoding} 编码")
+                encoder = FeatureEncoder(request.feature_columns, categorical_columns, method=encoding)
+                X = encoder.fit_transform(df[request.feature_columns], dtype=x_dtype)
+                feature_names = encoder.feature_names
+                print(f"编码后的稀疏矩阵: 形状 {X.shape}, 非零元素 {X.nnz}")
+            else:
+                X = df[request.feature_columns].to_numpy(dtype=x_dtype)
+            y = df[request.target_column].to_numpy(dtype=np.float64)
             print(f"准备训练数据 - X形状: {X.shape}, y形状: {y.shape}")
             print(f"X数据类型: {X.dtype}, y数据类型: {y.dtype}")
 
@@ -252,15 +605,64 @@ def train_new_model(request: TrainingRequest):
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
 
             print(f"开始训练模型 {request.model_type}，参数: {request.parameters}")
+            time_budget = TRAINING_TIME_BUDGET if request.time_budget is None else request.time_budget
             model, training_result = train_model(
                 model_type=request.model_type,
                 X=X,
                 y=y,
                 parameters=request.parameters,
                 test_size=request.test_size,
-                feature_names=request.feature_columns
+                feature_names=feature_names,
+                progress=report,
+                time_budget=time_budget,
+                early_stopping=request.early_stopping,
+                validation_fraction=request.validation_fraction,
+                n_iter_no_change=request.n_iter_no_change
             )
             print(f"模型训练完成，评估指标: {training_result['metrics']}")
+
+            # 报告紧凑模式节省的内存，需要时用float64重新训练以对比精度
+            compact_info = None
+            stored_compact = bool((dataset_info.get("storage") or {}).get("compact"))
+            if compact or stored_compact:
+                # 稀疏矩阵按存储的非零元素计算
+                values = X.data if encoder is not None else X
+                compact_info = {
+                    "dtype": str(X.dtype),
+                    "stored_compact": stored_compact,
+                    "x_bytes": int(values.nbytes),
+                    "x_float64_bytes": int(values.size * 8),
+                    "memory_saved_bytes": int(values.size * 8 - values.nbytes)
+                }
+                if request.compare_precision and (X.dtype != np.float64 or stored_compact):
+                    # 列式存储可能已在上传时降精度（包括目标列），参照模型从原文件读取float64数据，
+                    # 这样对比结果同时包含上传降精度和训练使用float32的影响
+                    print("使用原文件的float64数据重新训练以对比精度...")
+                    reference_df = load_columns(dataset_info, used_columns, original=True)
+                    _coerce_numeric(reference_df, numeric_columns)
+                    if encoder is not None:
+                        X_reference = encoder.transform(reference_df[request.feature_columns], dtype=np.float64)
+                    else:
+                        X_reference = reference_df[request.feature_columns].to_numpy(dtype=np.float64)
+                    y_reference = reference_df[request.target_column].to_numpy(dtype=np.float64)
+                    _, reference_result = train_model(
+                        model_type=request.model_type,
+                        X=X_reference,
+                        y=y_reference,
+                        parameters=request.parameters,
+                        test_size=request.test_size,
+                        feature_names=feature_names,
+                        time_budget=time_budget,
+                        early_stopping=request.early_stopping,
+                        validation_fraction=request.validation_fraction,
+                        n_iter_no_change=request.n_iter_no_change
+                    )
+                    compact_info["metrics_float64"] = reference_result["metrics"]
+                    compact_info["metric_deltas"] = {
+                        name: training_result["metrics"][name] - value
+                        for name, value in reference_result["metrics"].items()
+                    }
+                print(f"紧凑模式: {compact_info}")
         except Exception as e:
             error_msg = f"训练模型失败: {str(e)}"
             print(error_msg)
@@ -271,6 +673,13 @@ def train_new_model(request: TrainingRequest):
             model_path = f"data/models/{model_id}.joblib"
             joblib.dump(model, model_path)
             print(f"模型保存到: {model_path}")
+
+            # 类别编码器与模型一起保存，预测时使用同样的编码
+            encoder_path = None
+            if encoder is not None:
+                encoder_path = f"data/models/{model_id}.encoder.joblib"
+                joblib.dump(encoder, encoder_path)
+                print(f"类别编码器保存到: {encoder_path}")
         except Exception as e:
             error_msg = f"保存模型失败: {str(e)}"
             print(error_msg)
@@ -278,6 +687,11 @@ def train_new_model(request: TrainingRequest):
 
         # 保存模型信息
         try:
+            # 哈希编码的各个桶合并为一项，避免逐桶写入上万个条目
+            feature_importance = training_result.get("feature_importance", {})
+            if encoder is not None:
+                feature_importance = encoder.summarize_importance(feature_importance)
+
             model_info = {
                 "id": model_id,
                 "name": request.name or f"Model_{timestamp}",
@@ -289,29 +703,89 @@ def train_new_model(request: TrainingRequest):
                 "parameters": request.parameters,
                 "training_time": timestamp,
                 "metrics": training_result["metrics"],
-                "feature_importance": training_result.get("feature_importance", {}),
-                "model_path": model_path
+                "feature_importance": feature_importance,
+                "model_path": model_path,
+                "compact": compact_info,
+                "categorical_columns": categorical_columns,
+                "categorical_encoding": encoding if categorical_columns else None,
+                "encoder_path": encoder_path,
+                "training": training_result["training"]
             }
 
             with open(f"data/models/{model_id}.json", "w") as f:
                 json.dump(model_info, f)
             print(f"模型信息保存到: data/models/{model_id}.json")
 
+            progress.update({"status": "completed", "model_id": model_id})
             return model_info
         except Exception as e:
             error_msg = f"保存模型信息失败: {str(e)}"
             print(error_msg)
             raise HTTPException(status_code=500, detail=error_msg)
 
-    except HTTPException:
+    except HTTPException as e:
         # 重新抛出HTTP异常
+        progress.update({"status": "failed", "error": e.detail})
         raise
     except Exception as e:
         error_msg = f"训练模型过程中发生未知错误: {str(e)}"
         print(error_msg)
         import traceback
         traceback.print_exc()
+        progress.update({"status": "failed", "error": error_msg})
         raise HTTPException(status_code=500, detail=error_msg)
+    finally:
+        progress["finished_at"] = time.time()
+
+@app.get("/models/train/{training_id}/progress", response_model=Dict[str, Any])
+def get_training_progress(training_id: str):
+    """查询训练状态和最近一轮的进度"""
+    _prune_progress(training_progress)
+    if training_id not in training_progress:
+        raise HTTPException(status_code=404, detail=f"训练任务 {training_id} 不存在")
+    progress = training_progress[training_id]
+    return {
+        "status": progress["status"],
+        "model_id": progress["model_id"],
+        "error": progress.get("error"),
+        "iterations": len(progress["events"]),
+        "latest": progress["events"][-1] if progress["events"] else None
+    }
+
+@app.get("/models/train/{training_id}/events")
+async def stream_training_events(training_id: str):
+    """以Server-Sent Events推送训练进度
+
+    客户端可以在发起训练请求之前订阅，训练任务开始前最多等待TRAINING_WAIT_SECONDS秒。
+    每轮进度为一条progress事件，训练结束时发送done事件。
+    """
+    async def event_stream():
+        sent = 0
+        waited = 0.0
+        while training_id not in training_progress:
+            if waited >= TRAINING_WAIT_SECONDS:
+                yield f"event: done\ndata: {dumps({'status': 'not_found'}).decode('utf-8')}\n\n"
+                return
+            await asyncio.sleep(TRAINING_POLL_SECONDS)
+            waited += TRAINING_POLL_SECONDS
+
+        progress = training_progress[training_id]
+        while True:
+            events = progress["events"]
+            while sent < len(events):
+                yield f"event: progress\ndata: {dumps(events[sent]).decode('utf-8')}\n\n"
+                sent += 1
+            if progress["status"] != "running":
+                done = {"status": progress["status"], "model_id": progress["model_id"], "error": progress.get("error")}
+                yield f"event: done\ndata: {dumps(done).decode('utf-8')}\n\n"
+                return
+            await asyncio.sleep(TRAINING_POLL_SECONDS)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 @app.get("/models", response_model=List[ModelInfo])
 def list_models():
@@ -339,9 +813,17 @@ def get_model_details(model_id: str):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"获取模型详情失败: {str(e)}")
 
-@app.post("/models/{model_id}/evaluate", response_model=EvaluationResult)
-def evaluate_model_endpoint(model_id: str, dataset_id: Optional[str] = None):
-    """评估模型在特定数据集上的表现"""
+@app.post(
+    "/models/{model_id}/evaluate",
+    response_model=EvaluationResult,
+    responses={200: {"content": {FLOAT32_MEDIA_TYPE: {}}}}
+)
+def evaluate_model_endpoint(model_id: str, request: Request, dataset_id: Optional[str] = None):
+    """评估模型在特定数据集上的表现
+
+    请求头Accept包含application/x-float32时，以float32二进制返回predictions和actual，
+    其余字段放在X-Metadata响应头中。
+    """
     try:
         # 读取模型信息
         with open(f"data/models/{model_id}.json", "r") as f:
@@ -357,15 +839,16 @@ def evaluate_model_endpoint(model_id: str, dataset_id: Optional[str] = None):
         with open(f"data/datasets/{eval_dataset_id}.json", "r") as f:
             dataset_info = json.load(f)
 
-        # 读取数据集
-        file_path = dataset_info["file_path"]
-        if file_path.endswith('.csv'):
-            df = pd.read_csv(file_path)
-        elif file_path.endswith(('.xls', '.xlsx')):
-            df = pd.read_excel(file_path)
+        # 读取数据集（只读取评估所需的列）
+        used_columns = list(dict.fromkeys(model_info["feature_columns"] + [model_info["target_column"]]))
+        df = load_columns(dataset_info, used_columns)
 
-        # 准备评估数据
-        X = df[model_info["feature_columns"]].values
+        # 准备评估数据（有类别编码器时使用训练时的编码）
+        encoder = load_encoder(model_info)
+        if encoder is not None:
+            X = encoder.transform(df[model_info["feature_columns"]])
+        else:
+            X = df[model_info["feature_columns"]].values
         y = df[model_info["target_column"]].values
 
         # 评估模型
@@ -381,14 +864,23 @@ def evaluate_model_endpoint(model_id: str, dataset_id: Optional[str] = None):
             "dataset_id": eval_dataset_id,
             "timestamp": timestamp,
             "metrics": evaluation_result["metrics"],
-            "predictions": evaluation_result["predictions"].tolist(),
-            "actual": y.tolist()
+            "predictions": evaluation_result["predictions"],
+            "actual": y
         }
 
-        with open(f"data/results/{result_id}.json", "w") as f:
-            json.dump(result_info, f)
+        # 数组直接交给orjson序列化，避免tolist()和逐元素校验
+        content = dumps(result_info)
+        with open(f"data/results/{result_id}.json", "wb") as f:
+            f.write(content)
+
+        if wants_float32(request):
+            metadata = {k: v for k, v in result_info.items() if k not in ("predictions", "actual")}
+            return float32_response(
+                {"predictions": result_info["predictions"], "actual": result_info["actual"]},
+                metadata
+            )
 
-        return result_info
+        return Response(content=content, media_type="application/json")
 
     except FileNotFoundError as e:
         raise HTTPException(status_code=404, detail=str(e))
@@ -400,23 +892,190 @@ def predict_with_model_endpoint(model_id: str, request: PredictionRequest):
     """使用模型进行预测"""
     try:
         # 读取模型信息
-        with open(f"data/models/{model_id}.json", "r") as f:
-            model_info = json.load(f)
+        model_info = load_model_info(model_id)
 
-        # 加载模型
-        model = joblib.load(model_info["model_path"])
-
-        # 准备输入数据
-        input_data = np.array([request.features])
+        # 准备输入数据，没有类别编码器的模型只接受数值特征
+        input_data = [request.features]
+        if not model_info.get("encoder_path"):
+            try:
+                input_data = as_numeric_features(input_data)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
 
-        # 进行预测
-        prediction = predict_with_model(model, input_data)
+        # 进行预测（优先使用缓存结果）
+        prediction = predict_cached(model_info, input_data)
 
         return {"prediction": float(prediction[0])}
 
+    except HTTPException:
+        raise
     except FileNotFoundError:
         raise HTTPException(status_code=404, detail=f"模型 {model_id} 不存在")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"预测失败: {str(e)}")
+
+@app.get("/prediction-cache/stats", response_model=Dict[str, Any])
+def get_prediction_cache_stats():
+    """获取预测结果缓存的命中率等统计信息"""
+    return prediction_cache.stats()
+
+@app.delete("/prediction-cache")
+def clear_prediction_cache(model_id: Optional[str] = None):
+    """清空预测结果缓存（可只清空指定模型）"""
+    prediction_cache.clear(model_id)
+    return {"message": "预测结果缓存已清空"}
+
+@app.post("/ensembles", response_model=EnsembleInfo)
+def create_ensemble(request: EnsembleRequest):
+    """保存集成模型定义（成员模型及权重）"""
+    if not request.members:
+        raise HTTPException(status_code=400, detail="集成模型至少需要一个成员模型")
+    for member in request.members:
+        if not os.path.exists(f"data/models/{member.model_id}.json"):
+            raise HTTPException(status_code=404, detail=f"模型 {member.model_id} 不存在")
+
+    try:
+        ensemble_info = {
+            "id": str(uuid.uuid4()),
+            "name": request.name,
+            "description": request.description,
+            "members": [member.model_dump() for member in request.members],
+            "created_time": datetime.now().strftime("%Y%m%d_%H%M%S")
+        }
+        with open(f"data/ensembles/{ensemble_info['id']}.json", "w") as f:
+            json.dump(ensemble_info, f)
+        return ensemble_info
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"保存集成模型失败: {str(e)}")
+
+@app.get("/ensembles", response_model=List[EnsembleInfo])
+def list_ensembles():
+    """获取所有集成模型列表"""
+    ensembles = []
+    try:
+        for filename in os.listdir("data/ensembles"):
+            if filename.endswith(".json"):
+                with open(f"data/ensembles/{filename}", "r") as f:
+                    ensembles.append(json.load(f))
+        return ensembles
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"获取集成模型列表失败: {str(e)}")
+
+@app.get("/ensembles/{ensemble_id}", response_model=EnsembleInfo)
+def get_ensemble_details(ensemble_id: str):
+    """获取集成模型详情"""
+    try:
+        with open(f"data/ensembles/{ensemble_id}.json", "r") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=f"集成模型 {ensemble_id} 不存在")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"获取集成模型详情失败: {str(e)}")
+
+@app.post("/models/predict")
+def predict_with_models_endpoint(request: MultiPredictionRequest):
+    """使用多个模型（或已保存的集成模型）对同一批特征进行预测
+
+    特征只校验一次，各模型并发预测，返回每个模型的预测结果和按权重融合后的结果。
+    """
+    try:
+        # 确定参与预测的模型及权重，重复的模型合并权重
+        if request.ensemble_id:
+            members = get_ensemble_details(request.ensemble_id)["members"]
+            members = [(member["model_id"], member["weight"]) for member in members]
+        elif request.model_ids:
+            weights = request.weights or [1.0] * len(request.model_ids)
+            if len(weights) != len(request.model_ids):
+                raise HTTPException(status_code=400, detail="weights的数量必须与model_ids一致")
+            members = list(zip(request.model_ids, weights))
+        else:
+            raise HTTPException(status_code=400, detail="请提供model_ids或ensemble_id")
+
+        model_weights: Dict[str, float] = {}
+        for model_id, weight in members:
+            model_weights[model_id] = model_weights.get(model_id, 0.0) + weight
+        total_weight = sum(model_weights.values())
+        if total_weight <= 0:
+            raise HTTPException(status_code=400, detail="模型权重之和必须大于0")
+
+        # 读取模型信息
+        model_infos = {}
+        for model_id in model_weights:
+            try:
+                model_infos[model_id] = load_model_info(model_id)
+            except FileNotFoundError:
+                raise HTTPException(status_code=404, detail=f"模型 {model_id} 不存在")
+
+        # 校验特征（只做一次）
+        # 类别特征以字符串传入，这里统一保留为object数组，由各模型按需转换
+        X = np.asarray(request.features, dtype=object)
+        if X.ndim != 2 or X.shape[0] == 0:
+            raise HTTPException(status_code=400, detail="features必须是非空的二维数组")
+
+        feature_columns = request.feature_columns
+        if feature_columns is None:
+            feature_columns = next(iter(model_infos.values()))["feature_columns"]
+            if any(info["feature_columns"] != feature_columns for info in model_infos.values()):
+                raise HTTPException(status_code=400, detail="各模型的特征列不一致，请提供feature_columns")
+        if X.shape[1] != len(feature_columns):
+            raise HTTPException(
+                status_code=400,
+                detail=f"特征数量不匹配: 期望 {len(feature_columns)} 个，实际 {X.shape[1]} 个"
+            )
+
+        column_index = {col: i for i, col in enumerate(feature_columns)}
+        for model_id, info in model_infos.items():
+            missing = [col for col in info["feature_columns"] if col not in column_index]
+            if missing:
+                raise HTTPException(status_code=400, detail=f"模型 {model_id} 缺少以下特征列: {missing}")
+
+        # 没有类别编码器的模型只接受数值特征，这些模型用到的列统一转换一次
+        numeric_index = {}
+        X_numeric = None
+        numeric_columns = [
+            col for col in feature_columns
+            if any(col in info["feature_columns"] for info in model_infos.values() if not info.get("encoder_path"))
+        ]
+        if numeric_columns:
+            numeric_index = {col: i for i, col in enumerate(numeric_columns)}
+            try:
+                X_numeric = as_numeric_features(X[:, [column_index[col] for col in numeric_columns]])
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+
+        # 按各模型的特征列从同一批数据中选取输入
+        inputs = {}
+        for model_id, info in model_infos.items():
+            if info.get("encoder_path"):
+                source, index, source_columns = X, column_index, feature_columns
+            else:
+                source, index, source_columns = X_numeric, numeric_index, numeric_columns
+            if info["feature_columns"] == source_columns:
+                inputs[model_id] = source
+            else:
+                inputs[model_id] = source[:, [index[col] for col in info["feature_columns"]]]
+
+        # 各模型并发预测，总耗时接近最慢的模型
+        def run(model_id: str) -> np.ndarray:
+            return predict_cached(model_infos[model_id], inputs[model_id])
+
+        model_ids = list(model_weights)
+        predictions = dict(zip(model_ids, prediction_executor.map(track_thread(run), model_ids)))
+
+        blended = sum(model_weights[model_id] * predictions[model_id] for model_id in model_ids) / total_weight
+
+        return FastJSONResponse({
+            "ensemble_id": request.ensemble_id,
+            "weights": model_weights,
+            "predictions": predictions,
+            "blended": blended
+        })
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"多模型预测失败: {str(e)}")
+
+if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,204 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from .config import MODEL_CACHE_SIZE, PREDICTION_CACHE_SIZE, PREDICTION_CACHE_TTL
+from .simple_models import predict_with_model
+
+def load_model_info(model_id: str) -> Dict[str, Any]:
+    """读取模型信息"""
+    with open(f"data/models/{model_id}.json", "r") as f:
+        return json.load(f)
+
+class ModelCache:
+    """已加载模型的LRU缓存，模型文件修改后自动重新加载"""
+    def __init__(self, max_size: int = MODEL_CACHE_SIZE):
+        self.max_size = max_size
+        self._models: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, model_path: str) -> Any:
+        mtime = os.path.getmtime(model_path)
+        with self._lock:
+            cached = self._models.get(model_path)
+            if cached is not None and cached[0] == mtime:
+                self._models.move_to_end(model_path)
+                return cached[1]
+
+        model = joblib.load(model_path)
+        with self._lock:
+            self._models[model_path] = (mtime, model)
+            self._models.move_to_end(model_path)
+            while len(self._models) > self.max_size:
+                self._models.popitem(last=False)
+        return model
+
+model_cache = ModelCache()
+
+def load_model(model_info: Dict[str, Any]) -> Any:
+    """加载模型（带缓存）"""
+    return model_cache.get(model_info["model_path"])
+
+def load_encoder(model_info: Dict[str, Any]) -> Any:
+    """加载模型的类别编码器（带缓存），没有编码器时返回None"""
+    if not model_info.get("encoder_path"):
+        return None
+    return model_cache.get(model_info["encoder_path"])
+
+def _predict(model_info: Dict[str, Any], X: np.ndarray) -> np.ndarray:
+    """对已准备好的输入进行预测，有类别编码器时先编码为稀疏矩阵"""
+    encoder = load_encoder(model_info)
+    if encoder is not None:
+        X = encoder.transform(pd.DataFrame(X, columns=model_info["feature_columns"]))
+    return np.asarray(predict_with_model(load_model(model_info), X), dtype=np.float64)
+
+class PredictionCache:
+    """按模型划分的预测结果缓存
+
+    键为规范化后特征向量的哈希，条目超过TTL后失效，每个模型最多保存max_size条（LRU淘汰）。
+    模型文件的修改时间变化时，该模型的全部缓存失效。
+    """
+    def __init__(self, max_size: int = PREDICTION_CACHE_SIZE, ttl: float = PREDICTION_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: Dict[str, "OrderedDict[bytes, Tuple[float, float]]"] = {}
+        self._versions: Dict[str, float] = {}
+        self._stats: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0
+
+    @staticmethod
+    def key(row: np.ndarray) -> bytes:
+        """特征向量的规范化哈希（数值统一为小端float64，-0.0视为0.0）"""
+        if row.dtype == object:
+            # 含类别特征的行：字符串原样保留，其余值统一为浮点数
+            values = [value if value is None or isinstance(value, str) else float(value) + 0.0 for value in row]
+            return hashlib.blake2b(repr(values).encode("utf-8"), digest_size=16).digest()
+        row = np.ascontiguousarray(row, dtype="<f8") + 0.0
+        return hashlib.blake2b(row.tobytes(), digest_size=16).digest()
+
+    def _model_entries(self, model_id: str, version: float) -> "OrderedDict[bytes, Tuple[float, float]]":
+        """获取模型的缓存条目，模型版本变化时清空（调用方需持有锁）"""
+        stats = self._stats.setdefault(
+            model_id,
+            {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "invalidations": 0}
+        )
+        if self._versions.get(model_id) != version:
+            if model_id in self._entries:
+                stats["invalidations"] += 1
+            self._entries[model_id] = OrderedDict()
+            self._versions[model_id] = version
+        return self._entries[model_id]
+
+    def get_many(self, model_id: str, version: float, keys: List[bytes]) -> List[Optional[float]]:
+        """批量查询，未命中或已过期的位置返回None"""
+        now = time.monotonic()
+        results: List[Optional[float]] = []
+        with self._lock:
+            entries = self._model_entries(model_id, version)
+            stats = self._stats[model_id]
+            for key in keys:
+                entry = entries.get(key)
+                if entry is not None and now - entry[0] > self.ttl:
+                    del entries[key]
+                    stats["expirations"] += 1
+                    entry = None
+                if entry is None:
+                    stats["misses"] += 1
+                    results.append(None)
+                else:
+                    entries.move_to_end(key)
+                    stats["hits"] += 1
+                    results.append(entry[1])
+        return results
+
+    def put_many(self, model_id: str, version: float, keys: List[bytes], values: np.ndarray) -> None:
+        """批量写入预测结果"""
+        now = time.monotonic()
+        with self._lock:
+            entries = self._model_entries(model_id, version)
+            stats = self._stats[model_id]
+            for key, value in zip(keys, values):
+                entries[key] = (now, float(value))
+                entries.move_to_end(key)
+            while len(entries) > self.max_size:
+                entries.popitem(last=False)
+                stats["evictions"] += 1
+
+    def clear(self, model_id: Optional[str] = None) -> None:
+        """清空缓存（指定model_id时只清空该模型）"""
+        with self._lock:
+            if model_id is None:
+                self._entries.clear()
+                self._versions.clear()
+            else:
+                self._entries.pop(model_id, None)
+                self._versions.pop(model_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        """缓存命中率等统计信息"""
+        with self._lock:
+            models = {}
+            for model_id, stats in self._stats.items():
+                lookups = stats["hits"] + stats["misses"]
+                models[model_id] = {
+                    **stats,
+                    "size": len(self._entries.get(model_id, ())),
+                    "hit_rate": stats["hits"] / lookups if lookups else 0.0
+                }
+        hits = sum(stats["hits"] for stats in models.values())
+        misses = sum(stats["misses"] for stats in models.values())
+        return {
+            "enabled": self.enabled,
+            "max_size": self.max_size,
+            "ttl": self.ttl,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+            "models": models
+        }
+
+prediction_cache = PredictionCache()
+
+def as_numeric_features(X: Any) -> np.ndarray:
+    """将没有类别编码器的模型的输入转换为float64，包含非数值或缺失值时抛出ValueError"""
+    try:
+        X = np.asarray(X, dtype=np.float64)
+    except (TypeError, ValueError):
+        raise ValueError("该模型只接受数值特征")
+    if np.isnan(X).any():
+        raise ValueError("该模型的特征不能为空")
+    return X
+
+def predict_cached(model_info: Dict[str, Any], X: Any) -> np.ndarray:
+    """使用模型预测，逐行复用缓存结果，全部命中时不加载模型
+
+    有类别编码器的模型保留原始值（object数组），其余模型的输入转换为float64。
+    """
+    X = np.asarray(X, dtype=object) if model_info.get("encoder_path") else as_numeric_features(X)
+    if not prediction_cache.enabled:
+        return _predict(model_info, X)
+
+    model_id = model_info["id"]
+    version = os.path.getmtime(model_info["model_path"])
+    keys = [PredictionCache.key(row) for row in X]
+    cached = prediction_cache.get_many(model_id, version, keys)
+
+    result = np.array([np.nan if value is None else value for value in cached], dtype=np.float64)
+    missing = [i for i, value in enumerate(cached) if value is None]
+    if missing:
+        predictions = _predict(model_info, X[missing])
+        result[missing] = predictions
+        prediction_cache.put_many(model_id, version, [keys[i] for i in missing], predictions)
+    return result
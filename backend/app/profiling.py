@@ -0,0 +1,143 @@
+import functools
+import os
+import sys
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# 性能分析结果目录
+PROFILES_DIR = "data/profiles"
+
+def profile_path(profile_id: str) -> str:
+    """性能分析结果文件路径（speedscope格式）"""
+    return os.path.join(PROFILES_DIR, f"{profile_id}.speedscope.json")
+
+class SamplingProfiler:
+    """基于后台线程的采样分析器
+
+    每隔interval秒通过sys._current_frames()抓取一次调用栈，只记录通过add_thread登记的线程：
+    处理请求的事件循环线程，以及经track_thread包装后为该请求执行同步代码的线程池线程。
+    事件循环线程由所有请求共享，其结果中可能包含并发请求的协程。每个线程在结果中是一个独立的profile。
+    """
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self._frames: List[Dict[str, Any]] = []
+        self._frame_ids: Dict[Tuple[str, str, int], int] = {}
+        self._samples: Dict[int, List[Tuple[List[int], float]]] = {}
+        self._thread_names: Dict[int, str] = {}
+        self._threads: Dict[int, int] = {}
+        self._shared_threads: set = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.start_time = 0.0
+        self.end_time = 0.0
+
+    def add_thread(self, thread_id: Optional[int] = None, shared: bool = False) -> None:
+        """登记需要采样的线程，可重复登记，与remove_thread成对调用"""
+        thread_id = threading.get_ident() if thread_id is None else thread_id
+        with self._lock:
+            self._threads[thread_id] = self._threads.get(thread_id, 0) + 1
+            if shared:
+                self._shared_threads.add(thread_id)
+
+    def remove_thread(self, thread_id: Optional[int] = None) -> None:
+        """线程不再为该请求工作时取消登记"""
+        thread_id = threading.get_ident() if thread_id is None else thread_id
+        with self._lock:
+            count = self._threads.get(thread_id, 0) - 1
+            if count > 0:
+                self._threads[thread_id] = count
+            else:
+                self._threads.pop(thread_id, None)
+
+    def start(self) -> None:
+        self.start_time = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.end_time = time.perf_counter()
+
+    def _frame_id(self, frame) -> int:
+        code = frame.f_code
+        key = (code.co_name, code.co_filename, code.co_firstlineno)
+        if key not in self._frame_ids:
+            self._frame_ids[key] = len(self._frames)
+            self._frames.append({"name": code.co_name, "file": code.co_filename, "line": code.co_firstlineno})
+        return self._frame_ids[key]
+
+    def _run(self) -> None:
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        last = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            now = time.perf_counter()
+            elapsed, last = now - last, now
+            with self._lock:
+                threads = set(self._threads)
+            frames = sys._current_frames()
+            for thread_id in threads:
+                frame = frames.get(thread_id)
+                if frame is None:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(frame)
+                    frame = frame.f_back
+                if thread_id not in names:
+                    names = {thread.ident: thread.name for thread in threading.enumerate()}
+                self._thread_names[thread_id] = names.get(thread_id, str(thread_id))
+                # speedscope要求调用栈从根到叶
+                ids = [self._frame_id(f) for f in reversed(stack)]
+                self._samples.setdefault(thread_id, []).append((ids, elapsed))
+
+    def to_speedscope(self, name: str) -> Dict[str, Any]:
+        """导出为speedscope的sampled格式"""
+        duration = self.end_time - self.start_time
+        profiles = []
+        for thread_id, samples in self._samples.items():
+            profiles.append({
+                "type": "sampled",
+                "name": f"{name} [{self._thread_names[thread_id]}{' (shared)' if thread_id in self._shared_threads else ''}]",
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": duration,
+                "samples": [stack for stack, _ in samples],
+                "weights": [weight for _, weight in samples]
+            })
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": name,
+            "exporter": "deepdive-sampling-profiler",
+            "activeProfileIndex": 0,
+            "shared": {"frames": self._frames},
+            "profiles": profiles
+        }
+
+# 当前请求的分析器，由性能分析中间件设置
+active_profiler: ContextVar[Optional[SamplingProfiler]] = ContextVar("active_profiler", default=None)
+
+def track_thread(func: Callable) -> Callable:
+    """包装在线程池中执行的同步函数，使执行它的线程计入当前请求的性能分析
+
+    包装时已处于开启分析的请求中则绑定该分析器（ThreadPoolExecutor不传递上下文变量），
+    否则在调用时从上下文变量中查找（FastAPI执行同步接口的线程池会复制请求的上下文）。
+    """
+    bound = active_profiler.get()
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        profiler = bound or active_profiler.get()
+        if profiler is None:
+            return func(*args, **kwargs)
+        profiler.add_thread()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profiler.remove_thread()
+
+    return wrapper
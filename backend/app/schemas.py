@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Union
 
 class DatasetInfo(BaseModel):
     """数据集信息模型"""
@@ -11,6 +11,9 @@ class DatasetInfo(BaseModel):
     rows: int
     columns: List[str]
     file_path: str
+    file_size: Optional[int] = None
+    dtypes: Optional[Dict[str, str]] = None
+    storage: Optional[Dict[str, Any]] = None
 
 class ModelInfo(BaseModel):
     """模型信息模型"""
@@ -26,6 +29,11 @@ class ModelInfo(BaseModel):
     metrics: Dict[str, float]
     feature_importance: Optional[Dict[str, float]] = None
     model_path: str
+    compact: Optional[Dict[str, Any]] = None
+    categorical_columns: Optional[List[str]] = None
+    categorical_encoding: Optional[str] = None
+    encoder_path: Optional[str] = None
+    training: Optional[Dict[str, Any]] = None
 
 class TrainingRequest(BaseModel):
     """模型训练请求模型"""
@@ -37,10 +45,19 @@ class TrainingRequest(BaseModel):
     test_size: float = 0.2
     name: Optional[str] = None
     description: Optional[str] = None
+    compact: Optional[bool] = None
+    compare_precision: bool = False
+    categorical_encoding: Optional[str] = None
+    categorical_columns: Optional[List[str]] = None
+    training_id: Optional[str] = None
+    time_budget: Optional[float] = None
+    early_stopping: bool = False
+    validation_fraction: float = 0.1
+    n_iter_no_change: int = 10
 
 class PredictionRequest(BaseModel):
     """预测请求模型"""
-    features: List[float]
+    features: List[Union[float, str, None]]
 
 class EvaluationResult(BaseModel):
     """模型评估结果模型"""
@@ -50,4 +67,31 @@ class EvaluationResult(BaseModel):
     timestamp: str
     metrics: Dict[str, float]
     predictions: List[float]
-    actual: List[float]
\ No newline at end of file
+    actual: List[float]
+
+class EnsembleMember(BaseModel):
+    """集成模型成员"""
+    model_id: str
+    weight: float = 1.0
+
+class EnsembleRequest(BaseModel):
+    """创建集成模型请求模型"""
+    name: str
+    description: Optional[str] = None
+    members: List[EnsembleMember]
+
+class EnsembleInfo(BaseModel):
+    """集成模型信息模型"""
+    id: str
+    name: str
+    description: Optional[str] = None
+    members: List[EnsembleMember]
+    created_time: str
+
+class MultiPredictionRequest(BaseModel):
+    """多模型预测请求模型，model_ids和ensemble_id二选一"""
+    model_ids: Optional[List[str]] = None
+    weights: Optional[List[float]] = None
+    ensemble_id: Optional[str] = None
+    features: List[List[Union[float, str, None]]]
+    feature_columns: Optional[List[str]] = None
@@ -0,0 +1,93 @@
+import json
+import math
+from typing import Any, Dict, Optional
+
+import numpy as np
+import pandas as pd
+from fastapi import Request
+from fastapi.responses import JSONResponse, Response
+
+# orjson为可选依赖，未安装时退回到标准库json
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# 原始float32二进制响应的内容类型，前端可用Float32Array直接解码
+FLOAT32_MEDIA_TYPE = "application/x-float32"
+
+# 二进制响应中描述数组布局和元数据的响应头
+FLOAT32_HEADERS = ["X-Array-Names", "X-Array-Lengths", "X-Metadata"]
+
+def _default(obj: Any) -> Any:
+    """处理orjson无法原生序列化的对象"""
+    # 非连续数组或object类型数组等orjson不直接支持的情况
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, pd.Timestamp):
+        return None if pd.isna(obj) else obj.isoformat()
+    if obj is pd.NA:
+        return None
+    if hasattr(obj, "isoformat"):
+        return obj.isoformat()
+    raise TypeError(f"无法序列化的类型: {type(obj).__name__}")
+
+def _sanitize(obj: Any) -> Any:
+    """将对象转换为标准库json可序列化的形式，NaN/Inf转换为None"""
+    if isinstance(obj, dict):
+        return {str(k): _sanitize(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_sanitize(v) for v in obj]
+    if isinstance(obj, np.ndarray):
+        return _sanitize(obj.tolist())
+    if isinstance(obj, np.generic):
+        return _sanitize(obj.item())
+    if isinstance(obj, float):
+        return obj if math.isfinite(obj) else None
+    if obj is None or isinstance(obj, (str, int, bool)):
+        return obj
+    return _sanitize(_default(obj))
+
+def dumps(content: Any) -> bytes:
+    """将内容序列化为JSON字节串，原生支持NumPy数组，NaN/Inf输出为null"""
+    if orjson is not None:
+        return orjson.dumps(
+            content,
+            default=_default,
+            option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+        )
+    return json.dumps(
+        _sanitize(content),
+        ensure_ascii=False,
+        allow_nan=False,
+        separators=(",", ":")
+    ).encode("utf-8")
+
+class FastJSONResponse(JSONResponse):
+    """基于orjson的JSON响应，支持NumPy数组和NaN/Inf"""
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+def wants_float32(request: Request) -> bool:
+    """判断客户端是否请求float32二进制格式"""
+    return FLOAT32_MEDIA_TYPE in request.headers.get("accept", "")
+
+def float32_response(arrays: Dict[str, Any], metadata: Optional[Dict[str, Any]] = None) -> Response:
+    """将多个数组按顺序打包为小端float32二进制响应
+
+    数组名称和长度通过响应头X-Array-Names和X-Array-Lengths描述，
+    其余元数据以JSON形式放在X-Metadata中。
+    """
+    names = list(arrays.keys())
+    buffers = [np.ascontiguousarray(arrays[name], dtype="<f4") for name in names]
+    body = b"".join(buffer.tobytes() for buffer in buffers)
+
+    headers = {
+        "X-Array-Names": ",".join(names),
+        "X-Array-Lengths": ",".join(str(len(buffer)) for buffer in buffers),
+        # 响应头只能包含latin-1字符，这里使用ASCII转义
+        "X-Metadata": json.dumps(_sanitize(metadata or {}), ensure_ascii=True, allow_nan=False)
+    }
+    return Response(content=body, media_type=FLOAT32_MEDIA_TYPE, headers=headers)
@@ -1,4 +1,6 @@
+import time
 import numpy as np
+from scipy import sparse
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import mean_squared_error, r2_score, mean_absolute_error
 from sklearn.linear_model import LinearRegression, Ridge, Lasso
@@ -7,7 +9,7 @@ from sklearn.pipeline import Pipeline
 from sklearn.svm import SVR
 from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
 from sklearn.neural_network import MLPRegressor
-from typing import Dict, Any, Tuple, List, Optional, Union
+from typing import Dict, Any, Tuple, List, Optional, Union, Callable
 
 # 模型注册表
 model_registry = {
@@ -144,6 +146,17 @@ model_registry = {
     }
 }
 
+# 接受float32输入且不会在内部转换回float64的模型类型（SVR基于libsvm，只支持float64）
+float32_model_types = {
+    "linear_regression",
+    "ridge_regression",
+    "lasso_regression",
+    "polynomial_regression",
+    "random_forest",
+    "gradient_boosting",
+    "mlp"
+}
+
 # 创建模型实例
 def create_model(model_type: str, parameters: Dict[str, Any], input_dim: Optional[int] = None) -> Any:
     """创建指定类型的模型实例"""
@@ -243,6 +256,115 @@ def create_model(model_type: str, parameters: Dict[str, Any], input_dim: Optiona
     else:
         raise ValueError(f"不支持的模型类型: {model_type}")
 
+# 支持逐轮汇报进度并可按时间预算中止的模型类型
+iterative_model_types = {"random_forest", "gradient_boosting", "mlp"}
+
+def _fit_with_progress(
+    model: Any,
+    model_type: str,
+    X_train: Any,
+    y_train: np.ndarray,
+    progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+    time_budget: Optional[float] = None,
+    early_stopping: bool = False,
+    validation_fraction: float = 0.1,
+    n_iter_no_change: int = 10
+) -> Dict[str, Any]:
+    """拟合模型，逐轮汇报进度，超过时间预算或验证集不再提升时提前停止
+
+    多层感知机逐轮partial_fit，梯度提升通过monitor回调，随机森林通过warm_start分批增加树。
+    其他模型只能一次拟合完成，时间预算对其无效。
+    """
+    start = time.perf_counter()
+    state = {"iterations": 0, "stopped_reason": "completed"}
+
+    def report(**event: Any) -> bool:
+        """汇报一轮进度，返回是否已超出时间预算"""
+        elapsed = time.perf_counter() - start
+        if progress is not None:
+            progress({"elapsed": elapsed, **event})
+        return bool(time_budget) and elapsed >= time_budget
+
+    if model_type == "mlp":
+        # 从训练集中划出验证集，用于提前停止
+        X_fit, y_fit, X_val, y_val = X_train, y_train, None, None
+        if early_stopping:
+            X_fit, X_val, y_fit, y_val = train_test_split(
+                X_train, y_train, test_size=validation_fraction, random_state=42
+            )
+        best_score, best_params, no_improvement = -np.inf, None, 0
+        best_loss, no_loss_improvement = np.inf, 0
+        for epoch in range(model.max_iter):
+            model.partial_fit(X_fit, y_fit)
+            state["iterations"] = epoch + 1
+            event = {"iteration": epoch + 1, "loss": float(model.loss_)}
+            if not early_stopping:
+                # 与MLPRegressor.fit相同的收敛判断：训练损失连续n_iter_no_change轮下降不超过tol
+                if model.loss_ > best_loss - model.tol:
+                    no_loss_improvement += 1
+                else:
+                    no_loss_improvement = 0
+                best_loss = min(best_loss, model.loss_)
+            if early_stopping:
+                score = model.score(X_val, y_val)
+                event["validation_score"] = float(score)
+                if score > best_score + model.tol:
+                    best_score, no_improvement = score, 0
+                    best_params = ([c.copy() for c in model.coefs_], [b.copy() for b in model.intercepts_])
+                else:
+                    no_improvement += 1
+            if report(**event):
+                state["stopped_reason"] = "time_budget"
+                break
+            if early_stopping and no_improvement >= n_iter_no_change:
+                state["stopped_reason"] = "early_stopping"
+                break
+            if not early_stopping and no_loss_improvement > model.n_iter_no_change:
+                state["stopped_reason"] = "converged"
+                break
+        # 恢复验证集上表现最好的参数
+        if best_params is not None:
+            model.coefs_, model.intercepts_ = best_params
+
+    elif model_type == "gradient_boosting":
+        if early_stopping:
+            model.set_params(n_iter_no_change=n_iter_no_change, validation_fraction=validation_fraction)
+
+        def monitor(i: int, estimator: Any, _locals: Dict[str, Any]) -> bool:
+            state["iterations"] = i + 1
+            if report(iteration=i + 1, n_estimators=i + 1, loss=float(estimator.train_score_[i])):
+                state["stopped_reason"] = "time_budget"
+                return True
+            return False
+
+        model.fit(X_train, y_train, monitor=monitor)
+        if early_stopping and model.n_estimators_ < model.n_estimators and state["stopped_reason"] == "completed":
+            state["stopped_reason"] = "early_stopping"
+
+    elif model_type == "random_forest":
+        # 分批增加树的数量，每批之后汇报进度并检查时间预算
+        target = model.n_estimators
+        step = max(1, target // 20)
+        model.set_params(warm_start=True)
+        fitted = 0
+        while fitted < target:
+            fitted = min(fitted + step, target)
+            model.set_params(n_estimators=fitted)
+            model.fit(X_train, y_train)
+            state["iterations"] = fitted
+            if report(iteration=fitted, n_estimators=fitted) and fitted < target:
+                state["stopped_reason"] = "time_budget"
+                break
+        model.set_params(warm_start=False)
+
+    else:
+        model.fit(X_train, y_train)
+        state["iterations"] = 1
+        report(iteration=1)
+
+    state["elapsed"] = time.perf_counter() - start
+    return state
+
 # 训练模型
 def train_model(
     model_type: str,
@@ -250,9 +372,17 @@ def train_model(
     y: np.ndarray,
     parameters: Dict[str, Any],
     test_size: float = 0.2,
-    feature_names: List[str] = None
+    feature_names: List[str] = None,
+    progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+    time_budget: Optional[float] = None,
+    early_stopping: bool = False,
+    validation_fraction: float = 0.1,
+    n_iter_no_change: int = 10
 ) -> Tuple[Any, Dict[str, Any]]:
-    """训练模型并返回训练结果"""
+    """训练模型并返回训练结果
+
+    progress用于接收逐轮训练进度，time_budget（秒）和early_stopping控制提前停止。
+    """
     try:
         print(f"开始训练模型: {model_type}")
         print(f"输入特征形状: {X.shape}")
@@ -263,12 +393,17 @@ def train_model(
         if X.shape[0] == 0 or y.shape[0] == 0:
             raise ValueError("输入数据为空")
         
-        if np.isnan(X).any() or np.isnan(y).any():
+        # 稀疏矩阵由特征编码器生成，缺失值已在编码时填充
+        x_has_nan = False if sparse.issparse(X) else np.isnan(X).any()
+        if x_has_nan or np.isnan(y).any():
             print("警告: 输入数据包含NaN值，将尝试处理")
             # 简单处理：用列均值填充NaN
-            col_mean = np.nanmean(X, axis=0)
-            inds = np.where(np.isnan(X))
-            X[inds] = np.take(col_mean, inds[1])
+            if x_has_nan:
+                # 输入可能是DataFrame的只读视图，复制后再填充
+                X = np.array(X, copy=True)
+                col_mean = np.nanmean(X, axis=0)
+                inds = np.where(np.isnan(X))
+                X[inds] = np.take(col_mean, inds[1])
             
             # 处理目标变量中的NaN
             if np.isnan(y).any():
@@ -285,8 +420,18 @@ def train_model(
         
         # 训练模型
         print("开始拟合模型...")
-        model.fit(X_train, y_train)
-        print("模型拟合完成")
+        fit_info = _fit_with_progress(
+            model,
+            model_type,
+            X_train,
+            y_train,
+            progress=progress,
+            time_budget=time_budget,
+            early_stopping=early_stopping,
+            validation_fraction=validation_fraction,
+            n_iter_no_change=n_iter_no_change
+        )
+        print(f"模型拟合完成: {fit_info}")
         
         # 预测
         print("生成测试集预测...")
@@ -356,6 +501,7 @@ def train_model(
                 "r2": float(r2)
             },
             "feature_importance": feature_importance,
+            "training": fit_info,
             "predictions": y_pred,
             "actual": y_test
         }
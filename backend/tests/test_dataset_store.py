@@ -0,0 +1,70 @@
+import os
+
+import numpy as np
+import pytest
+
+from app import dataset_store
+from app.dataset_store import build_row_index, read_rows, row_index_path
+
+
+@pytest.fixture(params=[2, 1000])
+def dataset(request, tmp_path, monkeypatch):
+    """带空行的CSV数据集，分别使用较小和默认的行偏移索引步长"""
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("data/datasets")
+    file_path = "data/datasets/blank_lines.csv"
+    with open(file_path, "w") as f:
+        f.write("a,b\n1,x\n\n2,y\n3,z\n   \n4,w\n5,v\n")
+    build_row_index(file_path, row_index_path("blank_lines"), stride=request.param)
+    return {"id": "blank_lines", "file_path": file_path, "columns": ["a", "b"], "rows": 5}
+
+
+@pytest.mark.parametrize("offset", range(5))
+def test_read_rows_skips_blank_lines_like_the_index(dataset, offset):
+    page = read_rows(dataset, offset, 2)
+    assert page["total"] == 5
+    assert [row["a"] for row in page["rows"]] == list(range(offset + 1, min(offset + 3, 6)))
+
+
+def test_read_rows_selected_columns(dataset):
+    page = read_rows(dataset, 2, 1, columns=["b"])
+    assert page["rows"] == [{"b": "z"}]
+
+
+@pytest.fixture
+def big_ints(tmp_path, monkeypatch):
+    """int64列的值超过2^53，第二个分块中出现缺失值的整数列会变为float64"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(dataset_store, "INGEST_CHUNK_ROWS", 2)
+    os.makedirs("data/datasets")
+    file_path = "data/datasets/big_ints.csv"
+    with open(file_path, "w") as f:
+        f.write("id,n\n")
+        for i in range(4):
+            f.write(f"{2 ** 60 + i},{'' if i == 3 else i}\n")
+    return file_path
+
+
+@pytest.mark.parametrize("compact", [False, True])
+def test_ingest_keeps_integer_precision(big_ints, compact):
+    ingested = dataset_store.ingest_dataset("big_ints", big_ints, compact=compact)
+    assert ingested["dtypes"] == {"id": "int64", "n": "float64"}
+
+    df = dataset_store.load_columns({"id": "big_ints", "file_path": big_ints}, ["id", "n"])
+    assert df["id"].tolist() == [2 ** 60 + i for i in range(4)]
+    assert df["n"].tolist()[:3] == [0, 1, 2]
+    assert np.isnan(df["n"].iloc[3])
+
+
+def test_compact_downcasts_from_exact_integer_range(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("data/datasets")
+    file_path = "data/datasets/ranges.csv"
+    with open(file_path, "w") as f:
+        f.write("small,edge\n")
+        f.write(f"-128,{2 ** 63 - 1}\n127,{2 ** 63 - 2}\n")
+    ingested = dataset_store.ingest_dataset("ranges", file_path, compact=True)
+    assert ingested["storage"]["column_dtypes"] == {"small": "int8", "edge": "int64"}
+
+    df = dataset_store.load_columns({"id": "ranges", "file_path": file_path}, ["small", "edge"])
+    assert df["edge"].tolist() == [2 ** 63 - 1, 2 ** 63 - 2]
@@ -29,6 +29,10 @@ const DatasetDetail = () => {
   const { id } = useParams();
   const [dataset, setDataset] = useState(null);
   const [loading, setLoading] = useState(true);
+  const [previewRows, setPreviewRows] = useState([]);
+  const [previewTotal, setPreviewTotal] = useState(0);
+  const [previewPage, setPreviewPage] = useState({ current: 1, pageSize: 10 });
+  const [previewLoading, setPreviewLoading] = useState(false);
   
   useEffect(() => {
     const fetchDataset = async () => {
@@ -47,6 +51,26 @@ const DatasetDetail = () => {
     fetchDataset();
   }, [id]);
   
+  // 按页从后端读取预览数据，只加载当前页的行
+  useEffect(() => {
+    const fetchPreview = async () => {
+      try {
+        setPreviewLoading(true);
+        const { current, pageSize } = previewPage;
+        const response = await datasetApi.getDatasetPreview(id, (current - 1) * pageSize, pageSize);
+        setPreviewRows(response.data.rows);
+        setPreviewTotal(response.data.total);
+      } catch (error) {
+        console.error('获取数据预览失败:', error);
+        message.error('获取数据预览失败');
+      } finally {
+        setPreviewLoading(false);
+      }
+    };
+    
+    fetchPreview();
+  }, [id, previewPage]);
+  
   // 生成表格列
   const generateColumns = (columns) => {
     return columns.map(column => ({
@@ -193,11 +217,18 @@ const DatasetDetail = () => {
             key="1"
           >
             <Table
-              dataSource={dataset.preview}
+              dataSource={previewRows}
               columns={generateColumns(dataset.info.columns)}
-              rowKey={(record, index) => index}
+              rowKey={(record, index) => (previewPage.current - 1) * previewPage.pageSize + index}
               scroll={{ x: 'max-content' }}
-              pagination={{ pageSize: 5 }}
+              loading={previewLoading}
+              pagination={{
+                current: previewPage.current,
+                pageSize: previewPage.pageSize,
+                total: previewTotal,
+                showSizeChanger: true,
+                onChange: (current, pageSize) => setPreviewPage({ current, pageSize })
+              }}
               size="small"
             />
           </TabPane>
@@ -66,14 +66,18 @@ const DatasetList = () => {
       }
       return true;
     },
-    customRequest: async ({ file, onSuccess, onError }) => {
+    customRequest: async ({ file, onSuccess, onError, onProgress }) => {
       try {
         setUploading(true);
         const formData = new FormData();
         formData.append('file', file);
         formData.append('description', description);
         
-        const response = await datasetApi.uploadDataset(formData);
+        const response = await datasetApi.uploadDataset(formData, (event) => {
+          if (event.total) {
+            onProgress({ percent: Math.round((event.loaded / event.total) * 100) }, file);
+          }
+        });
         
         message.success('数据集上传成功');
         onSuccess(response, file);
@@ -55,7 +55,7 @@ const ModelDetail = () => {
   const evaluateModel = async () => {
     try {
       setEvaluating(true);
-      const response = await modelApi.evaluateModel(id);
+      const response = await modelApi.evaluateModelBinary(id);
       setEvaluationResult(response.data);
       message.success('模型评估完成');
     } catch (error) {
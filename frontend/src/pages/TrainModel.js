@@ -22,6 +22,7 @@ import {
   InfoCircleOutlined
 } from '@ant-design/icons';
 import { useNavigate, useLocation } from 'react-router-dom';
+import ReactECharts from 'echarts-for-react';
 import { datasetApi, modelApi } from '../services/api';
 
 const { Title, Paragraph } = Typography;
@@ -33,6 +34,14 @@ const useQuery = () => {
   return new URLSearchParams(useLocation().search);
 };
 
+// 生成训练任务ID，crypto.randomUUID只在HTTPS或localhost下可用，其他情况退回到时间戳加随机数
+const generateTrainingId = () => {
+  if (window.crypto && typeof window.crypto.randomUUID === 'function') {
+    return window.crypto.randomUUID();
+  }
+  return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2, 10)}-${Math.random().toString(36).slice(2, 10)}`;
+};
+
 const TrainModel = () => {
   const navigate = useNavigate();
   const query = useQuery();
@@ -46,6 +55,7 @@ const TrainModel = () => {
   const [loading, setLoading] = useState(true);
   const [training, setTraining] = useState(false);
   const [datasetColumns, setDatasetColumns] = useState([]);
+  const [trainingEvents, setTrainingEvents] = useState([]);
   
   // 获取数据集列表和可用模型
   useEffect(() => {
@@ -119,6 +129,7 @@ const TrainModel = () => {
   
   // 训练模型
   const handleSubmit = async (values) => {
+    let source = null;
     try {
       // 处理特殊参数
       const processedValues = {...values};
@@ -139,6 +150,14 @@ const TrainModel = () => {
         }
       }
       
+      // 训练前订阅进度，实时显示训练曲线
+      const trainingId = generateTrainingId();
+      processedValues.training_id = trainingId;
+      setTrainingEvents([]);
+      source = modelApi.subscribeTrainingEvents(trainingId, (event) => {
+        setTrainingEvents(events => [...events, event]);
+      });
+      
       setTraining(true);
       const response = await modelApi.trainModel(processedValues);
       message.success('模型训练成功');
@@ -147,10 +166,53 @@ const TrainModel = () => {
       console.error('模型训练失败:', error);
       message.error('模型训练失败');
     } finally {
+      if (source) source.close();
       setTraining(false);
     }
   };
   
+  // 生成训练曲线图表选项
+  const generateProgressOptions = (events) => {
+    const lossEvents = events.filter(event => event.loss !== undefined);
+    const series = [];
+    if (lossEvents.length > 0) {
+      series.push({
+        name: '训练损失',
+        type: 'line',
+        showSymbol: false,
+        data: lossEvents.map(event => [event.iteration, event.loss])
+      });
+    }
+    const validationEvents = events.filter(event => event.validation_score !== undefined);
+    if (validationEvents.length > 0) {
+      series.push({
+        name: '验证集R²',
+        type: 'line',
+        showSymbol: false,
+        yAxisIndex: 1,
+        data: validationEvents.map(event => [event.iteration, event.validation_score])
+      });
+    }
+    
+    return {
+      tooltip: {
+        trigger: 'axis'
+      },
+      legend: {
+        data: series.map(item => item.name)
+      },
+      xAxis: {
+        type: 'value',
+        name: '迭代'
+      },
+      yAxis: [
+        { type: 'value', name: '损失' },
+        { type: 'value', name: 'R²' }
+      ],
+      series: series
+    };
+  };
+  
   // 渲染模型参数表单
   const renderModelParameters = () => {
     if (!selectedModelType) return null;
@@ -357,6 +419,23 @@ const TrainModel = () => {
               </Select>
             </Form.Item>
             
+            <Form.Item
+              name="time_budget"
+              label="时间预算（秒）"
+              tooltip="超过该时间后停止拟合（对随机森林、梯度提升和多层感知机有效），留空表示不限制"
+            >
+              <InputNumber style={{ width: '100%' }} min={1} placeholder="不限制" disabled={training} />
+            </Form.Item>
+            
+            <Form.Item
+              name="early_stopping"
+              label="提前停止"
+              tooltip="在验证集上的表现不再提升时提前停止训练"
+              valuePropName="checked"
+            >
+              <Switch disabled={training} />
+            </Form.Item>
+            
             <Form.Item
               name="name"
               label="模型名称"
@@ -409,6 +488,21 @@ const TrainModel = () => {
             />
           )}
           
+          {trainingEvents.length > 0 && (
+            <Card title="训练进度" style={{ marginTop: 16 }}>
+              <Paragraph>
+                已完成 {trainingEvents[trainingEvents.length - 1].iteration} 轮，
+                用时 {trainingEvents[trainingEvents.length - 1].elapsed.toFixed(1)} 秒
+              </Paragraph>
+              {trainingEvents.some(event => event.loss !== undefined) && (
+                <ReactECharts
+                  option={generateProgressOptions(trainingEvents)}
+                  style={{ height: 300 }}
+                />
+              )}
+            </Card>
+          )}
+          
           <Collapse style={{ marginTop: 16 }}>
             <Panel header="模型类型说明" key="1">
               <ul>
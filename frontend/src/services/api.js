@@ -8,6 +8,24 @@ const api = axios.create({
   },
 });
 
+// float32二进制响应的内容类型
+const FLOAT32_MEDIA_TYPE = 'application/x-float32';
+
+// 解码float32二进制响应：按X-Array-Names/X-Array-Lengths切分数组，并合并X-Metadata中的字段
+export const decodeFloat32Response = (response) => {
+  const names = (response.headers['x-array-names'] || '').split(',').filter(Boolean);
+  const lengths = (response.headers['x-array-lengths'] || '').split(',').filter(Boolean).map(Number);
+  const metadata = JSON.parse(response.headers['x-metadata'] || '{}');
+  const data = { ...metadata };
+  let offset = 0;
+  names.forEach((name, index) => {
+    const values = new Float32Array(response.data, offset * 4, lengths[index]);
+    data[name] = Array.from(values);
+    offset += lengths[index];
+  });
+  return { ...response, data };
+};
+
 // 数据集相关API
 export const datasetApi = {
   // 获取所有数据集
@@ -16,12 +34,28 @@ export const datasetApi = {
   // 获取数据集详情
   getDatasetById: (id) => api.get(`/datasets/${id}`),
   
+  // 分页预览数据集
+  getDatasetPreview: (id, offset = 0, limit = 50, columns = null) => api.get(`/datasets/${id}/preview`, {
+    params: { offset, limit, columns },
+    paramsSerializer: { indexes: null },
+  }),
+  
+  // 随机抽样数据集
+  getDatasetSample: (id, n = 10, seed = null, columns = null) => api.get(`/datasets/${id}/sample`, {
+    params: { n, seed, columns },
+    paramsSerializer: { indexes: null },
+  }),
+  
   // 上传数据集
-  uploadDataset: (formData) => api.post('/datasets/upload', formData, {
+  uploadDataset: (formData, onUploadProgress) => api.post('/datasets/upload', formData, {
     headers: {
       'Content-Type': 'multipart/form-data',
     },
+    onUploadProgress,
   }),
+  
+  // 查询上传和解析进度
+  getUploadProgress: (uploadId) => api.get(`/datasets/uploads/${uploadId}/progress`),
 };
 
 // 模型相关API
@@ -38,17 +72,64 @@ export const modelApi = {
   // 训练模型
   trainModel: (trainingData) => api.post('/models/train', trainingData),
   
+  // 订阅训练进度（Server-Sent Events），返回EventSource，使用完毕后需调用close()
+  subscribeTrainingEvents: (trainingId, onProgress, onDone) => {
+    const source = new EventSource(`${api.defaults.baseURL}/models/train/${trainingId}/events`);
+    source.addEventListener('progress', (event) => onProgress(JSON.parse(event.data)));
+    source.addEventListener('done', (event) => {
+      source.close();
+      if (onDone) onDone(JSON.parse(event.data));
+    });
+    return source;
+  },
+  
   // 评估模型
   evaluateModel: (modelId, datasetId = null) => {
     const url = `/models/${modelId}/evaluate`;
     return datasetId ? api.post(url, { dataset_id: datasetId }) : api.post(url);
   },
   
+  // 评估模型（float32二进制格式，响应体积更小）
+  evaluateModelBinary: (modelId) => api.post(`/models/${modelId}/evaluate`, null, {
+    headers: {
+      Accept: FLOAT32_MEDIA_TYPE,
+    },
+    responseType: 'arraybuffer',
+  }).then(decodeFloat32Response),
+  
   // 使用模型预测
   predict: (modelId, features) => api.post(`/models/${modelId}/predict`, { features }),
+  
+  // 使用多个模型预测同一批特征并融合结果
+  predictMulti: (modelIds, features, weights = null, featureColumns = null) => api.post('/models/predict', {
+    model_ids: modelIds,
+    weights,
+    features,
+    feature_columns: featureColumns,
+  }),
+  
+  // 使用已保存的集成模型预测
+  predictEnsemble: (ensembleId, features, featureColumns = null) => api.post('/models/predict', {
+    ensemble_id: ensembleId,
+    features,
+    feature_columns: featureColumns,
+  }),
+};
+
+// 集成模型相关API
+export const ensembleApi = {
+  // 获取所有集成模型
+  getAllEnsembles: () => api.get('/ensembles'),
+  
+  // 获取集成模型详情
+  getEnsembleById: (id) => api.get(`/ensembles/${id}`),
+  
+  // 创建集成模型
+  createEnsemble: (ensemble) => api.post('/ensembles', ensemble),
 };
 
 export default {
   datasetApi,
   modelApi,
+  ensembleApi,
 };
\ No newline at end of file